@@ -1,20 +1,25 @@
 # backend/app.py
 import eventlet
 
-eventlet.monkey_patch()
+# Patch only what the websocket server needs. Patching thread/time as well
+# turned every worker thread into a greenlet, so blocking SQLite writes
+# could stall unrelated timers and scheduler ticks unpredictably.
+eventlet.monkey_patch(socket=True, select=True, thread=False, time=False)
 
 import os
-from flask import Flask, jsonify, request
-from flask_sqlalchemy import SQLAlchemy
-from flask_socketio import SocketIO, emit
+from flask import Flask, Response, jsonify, request
+from flask.json.provider import JSONProvider
+from flask_socketio import SocketIO
 from flask_cors import CORS
-from apscheduler.schedulers.background import BackgroundScheduler
+from sqlalchemy import create_engine, event, select, text
 from datetime import datetime, timedelta
 import logging
 import json
+import orjson
 
-# Setup logging
-logging.basicConfig(level=logging.DEBUG)
+# Setup logging. INFO by default: the per-request/per-tick debug lines below
+# only format their arguments when DEBUG is explicitly enabled.
+logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # --- Absolute Path Setup ---
@@ -25,13 +30,28 @@ db_path = os.path.join(instance_folder, "hospital.db")
 try:
     if not os.path.exists(instance_folder):
         os.makedirs(instance_folder)
-        logger.info(f"Created instance folder at {instance_folder}")
+        logger.info("Created instance folder at %s", instance_folder)
 except OSError as e:
-    logger.error(f"Error creating instance folder {instance_folder}: {e}")
+    logger.error("Error creating instance folder %s: %s", instance_folder, e)
 # --- End Absolute Path Setup ---
 
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson.
+
+    orjson serializes datetime objects natively in C, so to_dict() can hand
+    back raw datetimes instead of paying for isoformat() per row.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 # Initialize Flask app
 app = Flask(__name__, instance_path=instance_folder, instance_relative_config=False)
+app.json = OrjsonProvider(app)
 
 # Configuration
 app.config["SECRET_KEY"] = os.environ.get(
@@ -39,13 +59,42 @@ app.config["SECRET_KEY"] = os.environ.get(
 )  # Change in production
 app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# Explicit pool settings: enough connections for concurrent API reads while
+# the simulation loop writes, stale-connection checks, and a busy timeout so
+# readers wait for the WAL writer instead of failing with 'database is locked'.
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+    "pool_size": 10,
+    "max_overflow": 20,
+    "pool_pre_ping": True,
+    "pool_recycle": 300,
+    "connect_args": {"check_same_thread": False, "timeout": 30},
+}
 
 # Initialize extensions
 CORS(
     app, resources={r"/api/*": {"origins": "*"}, r"/socket.io/*": {"origins": "*"}}
 )  # Allow frontend access
-# Use eventlet for async mode which is required by APScheduler with Flask-SocketIO
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode="eventlet")
+
+class _OrjsonSocketIOJson:
+    """orjson-backed stand-in for the json module Socket.IO serializes with.
+
+    orjson is ~5-10x faster than stdlib json on the small-dict payloads we
+    broadcast every tick. Socket.IO expects str output, so decode the bytes.
+    """
+
+    @staticmethod
+    def dumps(obj, *args, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    @staticmethod
+    def loads(s, *args, **kwargs):
+        return orjson.loads(s)
+
+
+# Use eventlet for async mode so the simulation loop and websockets share one hub
+socketio = SocketIO(
+    app, cors_allowed_origins="*", async_mode="eventlet", json=_OrjsonSocketIOJson
+)
 
 # Import models after db is initialized and within app context
 from models import db, Staff, WearableData
@@ -57,27 +106,72 @@ from simulator import simulate_data, populate_historical_data
 db.init_app(app)
 
 
+# --- SQLite Tuning ---
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Applies performance PRAGMAs to every new SQLite connection.
+
+    WAL mode makes commits append-only and lets API reads run while the
+    simulator writes; synchronous=NORMAL is safe under WAL and skips the
+    per-commit full fsync.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-65536")  # 64 MB page cache
+    cursor.execute("PRAGMA mmap_size=268435456")  # 256 MB memory-mapped I/O
+    cursor.close()
+
+
+def _set_read_pragmas(dbapi_connection, connection_record):
+    """Read-safe PRAGMAs for the read-only engine (no journal-mode writes)."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-65536")  # 64 MB page cache
+    cursor.execute("PRAGMA mmap_size=268435456")  # 256 MB memory-mapped I/O
+    cursor.close()
+
+
+with app.app_context():
+    event.listen(db.engine, "connect", _set_sqlite_pragmas)
+
+# Separate read-only engine for the GET endpoints: even under WAL the main
+# engine's connections can queue behind the simulator's write transaction,
+# while mode=ro connections never take the writer's lock at all.
+read_engine = create_engine(
+    f"sqlite:///file:{db_path}?mode=ro&cache=shared&uri=true",
+    connect_args={"check_same_thread": False, "timeout": 30},
+    pool_size=5,
+    max_overflow=10,
+    pool_pre_ping=True,
+    pool_recycle=300,
+)
+event.listen(read_engine, "connect", _set_read_pragmas)
+# --- End SQLite Tuning ---
+
+
 # --- Database Initialization ---
 def init_db():
     """Initializes the database and adds sample staff if empty."""
     # Folder creation moved before app init
     with app.app_context():
-        logger.info(f"Ensuring database tables exist at {db_path}...")
+        logger.info("Ensuring database tables exist at %s...", db_path)
         # The check for instance folder existence is done above now.
         # instance_path = os.path.join(app.instance_path) <--- Remove/Comment out
         # if not os.path.exists(instance_path):
         #     os.makedirs(instance_path)
-        #     logger.info(f"Created instance folder at {instance_path}")
+        #     logger.info("Created instance folder at %s", instance_path)
 
         try:
             db.create_all()
             logger.info("Database tables created (if they didn't exist).")
         except Exception as e:
-            logger.error(f"Error during db.create_all(): {e}", exc_info=True)
+            logger.error("Error during db.create_all(): %s", e, exc_info=True)
             raise  # Re-raise the exception to see the problem
 
         staff_created = False
-        if Staff.query.count() == 0:
+        staff_count = Staff.query.count()
+        if staff_count == 0:
             logger.info("No staff found. Loading sample staff from staff_data.json...")
             json_path = os.path.join(
                 basedir, "staff_data.json"
@@ -95,36 +189,101 @@ def init_db():
                 logger.info("Sample staff added from JSON file.")
                 staff_created = True  # Mark that staff were just created
             except FileNotFoundError:
-                logger.error(f"Error: staff_data.json not found at {json_path}")
+                logger.error("Error: staff_data.json not found at %s", json_path)
             except json.JSONDecodeError:
-                logger.error(f"Error: Could not decode JSON from {json_path}")
+                logger.error("Error: Could not decode JSON from %s", json_path)
             except Exception as e:
-                logger.error(f"Error loading staff from JSON: {e}", exc_info=True)
+                logger.error("Error loading staff from JSON: %s", e, exc_info=True)
                 db.session.rollback()  # Rollback if there was an error loading
         else:
-            logger.info(f"Found {Staff.query.count()} staff members in the database.")
+            logger.info("Found %s staff members in the database.", staff_count)
 
         # Populate historical data ONLY if staff were just created AND historical data is empty
-        if staff_created and WearableData.query.count() == 0:
+        wearable_count = WearableData.query.count()
+        if staff_created and wearable_count == 0:
             logger.info("Populating historical wearable data for the last 2 days...")
             try:
                 populate_historical_data(app, db)
                 logger.info("Historical data population complete.")
             except Exception as e:
-                logger.error(f"Error populating historical data: {e}", exc_info=True)
+                logger.error("Error populating historical data: %s", e, exc_info=True)
                 db.session.rollback()  # Rollback if population failed
-        elif WearableData.query.count() > 0:
-            logger.info(
-                f"Found existing wearable data ({WearableData.query.count()} records). Skipping historical population."
+        elif wearable_count > 0:
+            logger.info("Found existing wearable data (%s records). Skipping historical population.", wearable_count
             )
 
 
 # --- API Endpoints ---
+# Columns returned by /api/staff, in to_dict() order. Selecting columns
+# instead of entities skips full ORM object hydration per row.
+_STAFF_COLS = (
+    "id",
+    "name",
+    "role",
+    "stress_level",
+    "current_heart_rate",
+    "current_hrv",
+    "sleep_hours_last_night",
+    "current_steadiness",
+    "current_sleep_index",
+    "mental_wellness_index",
+    "last_update",
+)
+
+
+# Pre-encoded /api/staff body, rebuilt once per simulation tick. Between
+# ticks every GET serves the same bytes, so the query + serialization can
+# be skipped entirely (and 304'd away when the client already has them).
+_staff_cache = {"etag": None, "body": None}
+
+
+def _refresh_staff_cache(staff_dicts, etag):
+    _staff_cache["body"] = orjson.dumps(staff_dicts)
+    _staff_cache["etag"] = etag
+
+
+def _staff_cache_response():
+    etag = _staff_cache["etag"]
+    if request.if_none_match.contains(etag):
+        return Response(status=304)
+    response = Response(_staff_cache["body"], mimetype="application/json")
+    response.set_etag(etag)
+    return response
+
+
 @app.route("/api/staff", methods=["GET"])
 def get_staff():
     """Returns a list of all staff members with their latest status."""
-    staff_list = Staff.query.all()
-    return jsonify([staff.to_dict() for staff in staff_list])
+    if _staff_cache["body"] is not None:
+        return _staff_cache_response()
+
+    # Cold cache (no simulation tick yet): build from the database
+    with read_engine.connect() as conn:
+        rows = conn.execute(
+            select(*[getattr(Staff, col) for col in _STAFF_COLS])
+        ).all()
+    # last_update stays a datetime; OrjsonProvider emits it as ISO-8601
+    staff_dicts = [dict(zip(_STAFF_COLS, row)) for row in rows]
+    if staff_dicts:
+        last_updates = [d["last_update"] for d in staff_dicts if d["last_update"]]
+        if last_updates:
+            _refresh_staff_cache(staff_dicts, max(last_updates).isoformat())
+            return _staff_cache_response()
+    return jsonify(staff_dicts)
+
+
+# Columns returned by /api/staff/<id>/data, in to_dict() order
+_WD_COLS = (
+    "id",
+    "staff_id",
+    "timestamp",
+    "heart_rate",
+    "hrv",
+    "steadiness",
+    "sleep_index",
+    "mwi",
+    "steps",
+)
 
 
 @app.route("/api/staff/<int:staff_id>/data", methods=["GET"])
@@ -134,60 +293,121 @@ def get_staff_data(staff_id):
     Accepts optional 'sample=true' query param to return fewer data points for long ranges.
     If 'minutes' is not provided, returns all data (potentially sampled).
     """
+    # PK lookup first (hits the identity map when already loaded) so the
+    # data queries below don't each need their own 404 fallback check.
+    if db.session.get(Staff, staff_id) is None:
+        return jsonify({"error": "Staff member not found"}), 404
+
     minutes_str = request.args.get("minutes")
     should_sample = request.args.get("sample") == "true"
-    query = WearableData.query.filter(WearableData.staff_id == staff_id)
-
-    time_limited = False
+    time_threshold = None
     if minutes_str:
         try:
             minutes_back = int(minutes_str)
             time_threshold = datetime.utcnow() - timedelta(minutes=minutes_back)
-            query = query.filter(WearableData.timestamp >= time_threshold)
-            logger.debug(
-                f"Fetching data for staff {staff_id} from last {minutes_back} minutes."
+            logger.debug("Fetching data for staff %s from last %s minutes.", staff_id, minutes_back
             )
-            time_limited = True
         except ValueError:
             return jsonify({"error": "Invalid 'minutes' parameter"}), 400
     else:
-        logger.debug(f"Fetching all data for staff {staff_id}.")
+        logger.debug("Fetching all data for staff %s.", staff_id)
         # No time filter needed
 
-    # Order before potentially sampling
-    query = query.order_by(WearableData.timestamp.asc())
-
-    # Fetch all potentially matching data first
-    all_matching_data = query.all()
-    total_points = len(all_matching_data)
-
-    # Apply sampling if requested AND not already limited to a very short time
-    # (Avoid sampling tiny datasets)
-    sampled_data = all_matching_data
-    if should_sample and total_points > 100:  # Only sample if > 100 points
-        # Simple sampling: aim for ~100-200 points max
-        sample_rate = max(1, total_points // 150)  # Calculate N for every Nth point
-        sampled_data = all_matching_data[::sample_rate]
-        logger.debug(
-            f"Sampling applied: {len(sampled_data)} points returned from {total_points} (rate ~{sample_rate})."
-        )
-    elif should_sample:
-        logger.debug(
-            f"Sampling requested but not applied: {total_points} points <= 100."
+    if should_sample:
+        # Sample inside SQL instead of fetching everything and slicing in
+        # Python: count first, then keep every Nth row via ROW_NUMBER so
+        # only ~150 rows are ever transferred or hydrated.
+        params = {"staff_id": staff_id, "since": time_threshold}
+        with read_engine.connect() as conn:
+            total_points = conn.execute(
+                text(
+                    "SELECT COUNT(*) FROM wearable_data "
+                    "WHERE staff_id = :staff_id "
+                    "AND (:since IS NULL OR timestamp >= :since)"
+                ),
+                params,
+            ).scalar()
+
+            if total_points > 100:  # Only sample if > 100 points
+                # Simple sampling: aim for ~100-200 points max
+                sample_rate = max(1, total_points // 150)
+                rows = conn.execute(
+                    text(
+                        "SELECT id, staff_id, timestamp, heart_rate, hrv, "
+                        "steadiness, sleep_index, mwi, steps FROM ("
+                        "  SELECT *, ROW_NUMBER() OVER (ORDER BY timestamp ASC) AS rn"
+                        "  FROM wearable_data"
+                        "  WHERE staff_id = :staff_id"
+                        "  AND (:since IS NULL OR timestamp >= :since)"
+                        ") WHERE rn % :n = 0 ORDER BY timestamp ASC LIMIT 300"
+                    ),
+                    {**params, "n": sample_rate},
+                ).mappings().all()
+                logger.debug("Sampling applied: %s points returned from %s (rate ~%s).", len(rows), total_points, sample_rate
+                )
+                sampled_data = []
+                for row in rows:
+                    d = dict(row)
+                    # Raw SQL returns SQLite's stored string; normalize to the
+                    # same ISO-8601 form to_dict() produces.
+                    d["timestamp"] = d["timestamp"].replace(" ", "T")
+                    sampled_data.append(d)
+
+                return jsonify(sampled_data)
+
+        logger.debug("Sampling requested but not applied: %s points <= 100.", total_points
         )
 
-    # Check if staff member exists only if no data is found *after* potential filtering
-    if not sampled_data and Staff.query.get(staff_id) is None:
-        return jsonify({"error": "Staff member not found"}), 404
-
-    return jsonify([d.to_dict() for d in sampled_data])
+    # Unsampled (or tiny) result: stream rows straight from a server-side
+    # cursor instead of materializing the whole range in memory. The body
+    # is still one JSON array, just emitted incrementally.
+    where_clauses = [WearableData.staff_id == staff_id]
+    if time_threshold is not None:
+        where_clauses.append(WearableData.timestamp >= time_threshold)
+
+    # Empty ranges short-circuit before a streaming response is set up
+    has_rows = db.session.execute(
+        select(WearableData.id).where(*where_clauses).limit(1)
+    ).first()
+    if has_rows is None:
+        return jsonify([])
+
+    # Select plain columns, not the mapped entity: rows come back as
+    # lightweight tuples zipped into dicts below.
+    stmt = (
+        select(*[getattr(WearableData, col) for col in _WD_COLS])
+        .where(*where_clauses)
+        .order_by(WearableData.timestamp.asc())
+        .execution_options(yield_per=500)
+    )
+
+    def generate():
+        # The request's session is torn down before a streamed body
+        # finishes, so the generator owns its own (read-only) connection.
+        with read_engine.connect() as conn:
+            yield b"["
+            first = True
+            # partitions() hands back one yield_per-sized batch per fetchmany,
+            # so the WSGI layer sees ~500-row chunks instead of row-sized ones
+            for batch in conn.execute(stmt).partitions():
+                chunk = b",".join(
+                    orjson.dumps(dict(zip(_WD_COLS, row))) for row in batch
+                )
+                if first:
+                    first = False
+                else:
+                    yield b","
+                yield chunk
+            yield b"]"
+
+    return Response(generate(), mimetype="application/json")
 
 
 # --- SocketIO Events ---
 @socketio.on("connect")
 def handle_connect():
     """Handles new client connections."""
-    logger.info(f"Client connected: {request.sid}")
+    logger.info("Client connected: %s", request.sid)
     # Optionally send initial full state
     # staff_list = Staff.query.all()
     # emit('initial_state', {'staff': [s.to_dict() for s in staff_list]}, room=request.sid)
@@ -196,55 +416,79 @@ def handle_connect():
 @socketio.on("disconnect")
 def handle_disconnect():
     """Handles client disconnections."""
-    logger.info(f"Client disconnected: {request.sid}")
-
-
-def send_staff_update(staff_member):
-    """Emits updated staff data via SocketIO."""
-    update_data = staff_member.to_dict()
-    logger.debug(f"Emitting update for staff {staff_member.id}: {update_data}")
-    try:
-        socketio.emit("staff_update", update_data)
-        logger.debug(f"Successfully emitted staff_update for staff {staff_member.id}")
-    except Exception as e:
-        logger.error(
-            f"Error emitting staff_update for staff {staff_member.id}: {e}",
-            exc_info=True,
-        )
+    logger.info("Client disconnected: %s", request.sid)
+
 
+# Last emitted (hr, hrv, stress_level) per staff id, used to skip staff whose
+# displayed vitals did not change since the previous tick.
+_last_emitted = {}
 
-# --- Simulation Scheduler ---
-scheduler = BackgroundScheduler()
+
+# --- Simulation Loop ---
+def _broadcast_staff_batch(updated_staff):
+    """Batch callback for simulate_data: one emit per tick.
+
+    Only staff whose displayed vitals changed since the previous tick make
+    it into the payload; the /api/staff cache refreshes either way.
+    """
+    payload = []
+    for staff_dict in updated_staff:
+        vitals = (
+            staff_dict["current_heart_rate"],
+            staff_dict["current_hrv"],
+            staff_dict["stress_level"],
+        )
+        if _last_emitted.get(staff_dict["id"]) != vitals:
+            _last_emitted[staff_dict["id"]] = vitals
+            payload.append(staff_dict)
+
+    # Refresh the /api/staff response cache for this tick
+    if updated_staff:
+        _refresh_staff_cache(
+            updated_staff, updated_staff[0]["last_update"].isoformat()
+        )
+
+    if payload:
+        try:
+            socketio.emit("staff_batch_update", payload)
+            logger.debug("Emitted staff_batch_update for %s staff.", len(payload))
+        except Exception as e:
+            logger.error("Error emitting staff_batch_update: %s", e, exc_info=True)
 
 
 def run_simulation_job():
     """Function to be scheduled for running the simulation."""
     logger.info("Running simulation job...")
     with app.app_context():  # Need app context for db operations
-        simulate_data(app, db, socketio, send_staff_update)
+        simulate_data(app, db, batch_callback=_broadcast_staff_batch)
     logger.info("Simulation job finished.")
 
 
+def simulation_loop():
+    """Runs the simulation every 5 seconds on the eventlet hub.
+
+    Using socketio.start_background_task keeps the simulator cooperative
+    with the websocket greenlets instead of running in a separate OS
+    thread (as the old APScheduler BackgroundScheduler did).
+    """
+    while True:
+        try:
+            run_simulation_job()
+        except Exception as e:
+            logger.error("Simulation loop error: %s", e, exc_info=True)
+        socketio.sleep(5)
+
+
 # --- Main Execution ---
 if __name__ == "__main__":
     init_db()  # Ensure DB is ready before starting
 
-    # Schedule the simulation to run every 5 seconds
-    scheduler.add_job(func=run_simulation_job, trigger="interval", seconds=5)
-    scheduler.start()
-    logger.info("Simulation scheduler started, running every 5 seconds.")
+    # Run the simulation loop as a cooperative background task
+    socketio.start_background_task(simulation_loop)
+    logger.info("Simulation loop started, running every 5 seconds.")
 
     logger.info("Starting Flask-SocketIO server...")
     # Use eventlet server for better async/WebSocket performance
     # Run on 0.0.0.0 to be accessible from the frontend container/host
     socketio.run(app, host="0.0.0.0", port=5001, debug=False, use_reloader=False)
-
-    # Shut down the scheduler when exiting
-    try:
-        # Keep the main thread alive
-        while True:
-            pass
-    except (KeyboardInterrupt, SystemExit):
-        logger.info("Shutting down scheduler...")
-        scheduler.shutdown()
-        logger.info("Server stopped.")
+    logger.info("Server stopped.")
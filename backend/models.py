@@ -1,5 +1,4 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
 
 db = SQLAlchemy()
 
@@ -22,7 +21,9 @@ class Staff(db.Model):
     mental_wellness_index = db.Column(
         db.Float, default=75.0, nullable=True
     )  # Example: 0-100 scale
-    last_update = db.Column(db.DateTime, default=datetime.utcnow)
+    # Server-side default covers freshly seeded staff; the simulator always
+    # sets this explicitly, so no per-row Python default call is needed
+    last_update = db.Column(db.DateTime, server_default=db.func.now())
 
     def to_dict(self):
         return {
@@ -36,14 +37,22 @@ class Staff(db.Model):
             "current_steadiness": self.current_steadiness,
             "current_sleep_index": self.current_sleep_index,
             "mental_wellness_index": self.mental_wellness_index,
-            "last_update": self.last_update.isoformat() if self.last_update else None,
+            # Raw datetime: both Flask (OrjsonProvider) and Socket.IO
+            # (orjson) emit it as ISO-8601 without a Python isoformat() call
+            "last_update": self.last_update,
         }
 
 
 class WearableData(db.Model):
+    # Composite index covering the hot query pattern in get_staff_data:
+    # WHERE staff_id = ? AND timestamp >= ? ORDER BY timestamp
+    __table_args__ = (db.Index("ix_wearable_staff_ts", "staff_id", "timestamp"),)
+
     id = db.Column(db.Integer, primary_key=True)
     staff_id = db.Column(db.Integer, db.ForeignKey("staff.id"), nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Always passed explicitly (simulator caches one `now` per tick), so the
+    # old default=datetime.utcnow Python call per row is gone
+    timestamp = db.Column(db.DateTime, nullable=False)
     heart_rate = db.Column(db.Integer)
     hrv = db.Column(db.Integer)  # Heart Rate Variability
     # Add fields for historical tracking
@@ -58,7 +67,7 @@ class WearableData(db.Model):
         return {
             "id": self.id,
             "staff_id": self.staff_id,
-            "timestamp": self.timestamp.isoformat(),
+            "timestamp": self.timestamp,  # serialized to ISO-8601 by orjson
             "heart_rate": self.heart_rate,
             "hrv": self.hrv,
             "steadiness": self.steadiness,
@@ -1,49 +1,136 @@
 # backend/simulator.py
-import random
-from datetime import datetime, timedelta
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
 import logging
-import math  # Added for MWI calc
+import numpy as np
+from sqlalchemy import update
 from models import Staff, WearableData
 
 logger = logging.getLogger(__name__)
 
+
+def _utcnow():
+    """Naive UTC now. The DB stores naive UTC datetimes, so strip tzinfo.
+
+    Called exactly once per tick / per backfill run; everything downstream
+    reuses the returned value instead of re-reading the clock.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+# Shared numpy generator: one C-level call per random vector instead of one
+# Python-level random.* call per staff per tick. Each process owns its own
+# instance (workers build theirs from spawned seeds), so there is no shared
+# global random state. Set SIM_SEED for a reproducible run.
+_SIM_SEED = int(os.environ["SIM_SEED"]) if os.environ.get("SIM_SEED") else None
+rng = np.random.default_rng(_SIM_SEED)
+
 # Store baseline HR/HRV and recent trend to make simulation slightly more realistic
-staff_simulation_state = {}
+class SimState:
+    """Struct-of-arrays simulation state.
+
+    One dense slot per staff member: every scalar field is a parallel numpy
+    array, so the tick gathers and scatters whole columns with fancy
+    indexing instead of paying two dict lookups per field per staff.
+    id_to_idx maps a staff id to its slot.
+    """
+
+    def __init__(self):
+        self.id_to_idx = {}
+        self.baseline_hr = np.empty(0, np.int64)
+        self.baseline_hrv = np.empty(0, np.int64)
+        # -1 (decreasing), 0 (stable), 1 (increasing)
+        self.hr_trend = np.empty(0, np.int64)
+        # Chance of starting a stress event per cycle
+        self.stress_chance = np.empty(0, np.float64)
+        self.sleep_hours = np.empty(0, np.float64)
+        self.base_steadiness = np.empty(0, np.float64)
+        self.sleep_index_last_night = np.empty(0, np.float64)
+        # id/name/role never change, so the broadcast payload's static part
+        # is built once per slot instead of re-read from ORM attributes
+        self.static_fields = []
+
+    def __len__(self):
+        return len(self.static_fields)
+
+    def add_staff(self, staff):
+        """Appends a slot for `staff` with randomized baselines."""
+        self.id_to_idx[staff.id] = len(self.static_fields)
+        self.baseline_hr = np.append(self.baseline_hr, rng.integers(60, 81))
+        self.baseline_hrv = np.append(self.baseline_hrv, rng.integers(40, 71))
+        self.hr_trend = np.append(self.hr_trend, 0)
+        self.stress_chance = np.append(self.stress_chance, 0.05)
+        self.sleep_hours = np.append(self.sleep_hours, rng.uniform(5.5, 8.5))
+        self.base_steadiness = np.append(
+            self.base_steadiness, rng.uniform(0.7, 0.95)
+        )
+        self.sleep_index_last_night = np.append(
+            self.sleep_index_last_night, rng.uniform(5.0, 9.5)
+        )
+        self.static_fields.append(
+            {"id": staff.id, "name": staff.name, "role": staff.role}
+        )
+
+
+sim_state = SimState()
 last_simulated_day = None  # Track the day to update sleep daily
 
+# TTL cache over the staff table for the live tick. Plain snapshot dicts
+# rather than ORM instances: cached Staff objects would detach when the
+# tick's app context tears its session down. Between refreshes the tick
+# keeps the snapshots current itself (it is the only writer of these
+# columns), so the 5s loop only hits the table every TTL seconds.
+_staff_cache = {"rows": None, "ts": 0.0}
+_STAFF_CACHE_TTL = 30.0  # Seconds between staff table re-reads
+
+
+def _get_staff_rows():
+    """Returns cached per-staff vitals snapshots, refreshing past the TTL."""
+    now_mono = time.monotonic()
+    if (
+        _staff_cache["rows"] is None
+        or now_mono - _staff_cache["ts"] > _STAFF_CACHE_TTL
+    ):
+        staff_list = Staff.query.all()
+        # Newly added staff need simulation-state slots before their first tick
+        initialize_simulation_state(staff_list)
+        _staff_cache["rows"] = [
+            {
+                "id": staff.id,
+                "current_heart_rate": staff.current_heart_rate,
+                "current_hrv": staff.current_hrv,
+                "sleep_hours_last_night": staff.sleep_hours_last_night,
+                "current_sleep_index": staff.current_sleep_index,
+            }
+            for staff in staff_list
+        ]
+        _staff_cache["ts"] = now_mono
+    return _staff_cache["rows"]
+
+
+def invalidate_staff_cache():
+    """Forces the next tick to re-read the staff table (e.g. staff added)."""
+    _staff_cache["rows"] = None
+
 
 def initialize_simulation_state(staff_list):
     """Initialize state for each staff member if not already present."""
     global last_simulated_day
-    current_day = datetime.utcnow().day
+    current_day = _utcnow().day
     if last_simulated_day is None:  # Initialize on first run
         last_simulated_day = current_day
 
     for staff in staff_list:
-        if staff.id not in staff_simulation_state:
-            staff_simulation_state[staff.id] = {
-                "baseline_hr": random.randint(60, 80),
-                "baseline_hrv": random.randint(40, 70),
-                "hr_trend": 0,  # -1 (decreasing), 0 (stable), 1 (increasing)
-                "hrv_trend": 0,
-                "stress_event_chance": 0.05,  # 5% chance of starting a stress event per cycle
-                # Add initial values for new fields (can be randomized)
-                "sleep_hours": random.uniform(5.5, 8.5),
-                "base_steadiness": random.uniform(0.7, 0.95),
-                "sleep_index_last_night": random.uniform(
-                    5.0, 9.5
-                ),  # Initial last night value
-            }
-            logger.info(
-                f"Initialized simulation state for Staff ID {staff.id} ({staff.name})"
+        if staff.id not in sim_state.id_to_idx:
+            sim_state.add_staff(staff)
+            logger.info("Initialized simulation state for Staff ID %s (%s)", staff.id, staff.name
             )
         # Update sleep index if it's a new day (or initialization)
         elif last_simulated_day != current_day:
-            staff_simulation_state[staff.id]["sleep_index_last_night"] = random.uniform(
-                5.0, 9.5
-            )
-            logger.info(
-                f"Updated last night sleep index for Staff ID {staff.id} for new day."
+            idx = sim_state.id_to_idx[staff.id]
+            sim_state.sleep_index_last_night[idx] = rng.uniform(5.0, 9.5)
+            logger.info("Updated last night sleep index for Staff ID %s for new day.", staff.id
             )
 
     # Update the tracked day after processing all staff
@@ -51,6 +138,10 @@ def initialize_simulation_state(staff_list):
         last_simulated_day = current_day
 
 
+# Display strings for the kernel's int stress codes (0/1/2)
+_STRESS_LEVELS = ("Normal", "High", "Critical")
+
+
 def calculate_stress_level(hr, hrv):
     """Determines stress level based on heart rate and HRV."""
     if hr > 120 or hrv < 25:
@@ -62,34 +153,162 @@ def calculate_stress_level(hr, hrv):
 
 
 # --- New MWI Calculation --- ( Placeholder - needs refinement! )
+def calculate_mwi_vec(hr, hrv, steadiness, sleep):
+    """Array form of the MWI formula: accepts NumPy arrays (or scalars)
+    and computes every score with ufuncs, so the backfill can evaluate a
+    whole 48h series in one pass instead of ~34k scalar calls per staff.
+    """
+    # Component terms with the weights folded into the coefficients, so
+    # each contributes its share directly (one multiply per component).
+    # Weights: HR(20%), HRV(30%), Steadiness(30%), Sleep(20%)
+    hr_term = np.clip(
+        20.0 - np.maximum(0, hr - 60) * 0.3, 0, 20
+    )  # Lower HR (closer to 60) is better
+    hrv_term = np.clip((hrv - 30) * 0.6, 0, 30)  # Higher HRV (above 30) is better
+    steadiness_term = np.clip(steadiness * 30.0, 0, 30)  # Higher is better
+    sleep_term = np.clip((sleep - 4) * 5.0, 0, 20)  # 7-8 hours ideal
+
+    mwi = hr_term + hrv_term + steadiness_term + sleep_term
+
+    return np.round(np.clip(mwi, 0, 100), 1)  # Clamp between 0-100 and round
+
+
 def calculate_mwi(hr: int, hrv: int, steadiness: float, sleep: float) -> float:
     """Calculates a basic Mental Wellness Index (0-100). Higher is better.
 
     This is a VERY simplified placeholder formula.
     A real MWI would involve more complex analysis, trends, and potentially
     machine learning models based on validated research.
+
+    Thin scalar wrapper over calculate_mwi_vec so both paths share one
+    formula.
     """
-    # Normalize/score each component (examples)
-    hr_score = max(
-        0, 100 - (max(0, hr - 60) * 1.5)
-    )  # Lower HR (closer to 60) is better
-    hrv_score = min(100, max(0, (hrv - 30) * 2))  # Higher HRV (above 30) is better
-    steadiness_score = min(100, max(0, steadiness * 100))  # Higher steadiness is better
-    sleep_score = min(100, max(0, (sleep - 4) * 25))  # 7-8 hours ideal (scores 75-100)
+    return float(calculate_mwi_vec(hr, hrv, steadiness, sleep))
 
-    # Combine scores (example weights - adjust as needed)
-    # Weights: HR(20%), HRV(30%), Steadiness(30%), Sleep(20%)
-    mwi = (
-        (hr_score * 0.20)
-        + (hrv_score * 0.30)
-        + (steadiness_score * 0.30)
-        + (sleep_score * 0.20)
+
+# --- End MWI Calculation ---
+
+
+# Sleep phase per hour of day, as a lookup table: 0 = awake, 1 = falling
+# asleep (23:00), 2 = deep sleep (00:00-05:59), 3 = waking up (06:00).
+# Indexing this with the hour array replaces the old per-hour branch chain.
+_PHASE_OF_HOUR = np.zeros(24, dtype=np.int8)
+_PHASE_OF_HOUR[23] = 1
+_PHASE_OF_HOUR[0:6] = 2
+_PHASE_OF_HOUR[6] = 3
+
+# Per-minute progress curves for the sleep transitions, shared by every
+# staff-day: falling asleep ramps 0..1 across the hour, waking up is its
+# complement. Indexed by the minute array instead of dividing per step.
+_FALLING_CURVE = np.arange(60) / 60.0
+_WAKING_CURVE = 1.0 - _FALLING_CURVE
+
+
+# --- Per-staff historical series worker ---
+# Module-level and fed only primitives/arrays so ProcessPoolExecutor can
+# pickle the call into a worker process (no ORM objects, no app context).
+def _simulate_staff_history(
+    baseline_hr,
+    baseline_hrv,
+    base_steadiness,
+    sleep_hours,
+    sleep_index_last_night,
+    stress_event_chance,
+    hours,
+    minutes,
+    day_idx,
+    n_days,
+    seed,
+):
+    """Simulates one staff member's 48h series.
+
+    Returns ((hr, hrv, steadiness, sleep, mwi) arrays, final_state). Arrays
+    rather than row dicts keep the result small enough that pickling it
+    back from a pool worker costs ~1 MB instead of ~10 MB per staff.
+    """
+    # Independent, reproducible stream per staff (seeds come from one
+    # SeedSequence.spawn in the parent)
+    staff_rng = np.random.default_rng(seed)
+    n_steps = len(hours)
+
+    # One nightly sleep index per simulated day (was redrawn per
+    # day-rollover in the old time-outer loop)
+    sleep_night = staff_rng.uniform(5.0, 9.5, n_days)
+    sleep_night[0] = sleep_index_last_night
+
+    # Pre-drawn noise blocks, indexed by step
+    hr_noise = staff_rng.integers(-3, 4, n_steps)
+    event_roll = staff_rng.random(n_steps)
+    spike = staff_rng.integers(10, 21, n_steps)
+    hrv_noise = staff_rng.integers(-6, 7, n_steps)
+    stead_noise = staff_rng.uniform(-0.05, 0.05, n_steps)
+    stead_stress = staff_rng.uniform(0.0, 0.1, n_steps)
+    sleep_fall_var = staff_rng.uniform(-0.5, 0.5, n_steps)
+    sleep_deep_var = staff_rng.uniform(-0.7, 0.7, n_steps)
+    sleep_wake_var = staff_rng.uniform(-0.3, 0.3, n_steps)
+
+    # --- Heart rate: baseline + jitter + decaying stress spikes ---
+    # Noise around baseline, plus a linear ~5 minute decay ramp added at
+    # each stress-event index. Only the event indices (a few hundred over
+    # 48h) need a Python loop.
+    hr_dev = hr_noise.astype(np.float64)
+    event_steps = np.flatnonzero(event_roll < (stress_event_chance / 10))
+    decay_len = 60  # 60 steps * 5s = 5 minutes back to baseline
+    decay_ramp = np.linspace(1.0, 0.0, decay_len)
+    for step in event_steps:
+        end = min(step + decay_len, n_steps)
+        hr_dev[step:end] += float(spike[step]) * decay_ramp[: end - step]
+    hr_arr = np.clip(np.rint(baseline_hr + hr_dev), 50, 160).astype(np.int64)
+
+    # --- HRV: inverse to HR deviation, plus its own jitter ---
+    hrv_arr = np.clip(
+        baseline_hrv + hrv_noise - np.maximum(hr_arr - baseline_hr, 0) // 2,
+        15,
+        100,
+    )
+
+    # --- Steadiness: dips while HR is elevated ---
+    stead_arr = np.round(
+        np.clip(
+            base_steadiness
+            + stead_noise
+            - np.where(hr_arr > baseline_hr + 15, stead_stress, 0.0),
+            0,
+            1,
+        ),
+        2,
     )
 
-    return round(max(0, min(100, mwi)), 1)  # Clamp between 0-100 and round
+    # --- Sleep index: branchless via the per-hour phase LUT ---
+    sleep_last = sleep_night[day_idx]  # Per-step "last night" score
+    phase = _PHASE_OF_HOUR[hours]
+    sleep_arr = np.where(
+        phase == 1,
+        sleep_last * _FALLING_CURVE[minutes] + sleep_fall_var,  # Falling asleep
+        np.where(
+            phase == 2,
+            sleep_last + sleep_deep_var,  # Deep sleep
+            np.where(
+                phase == 3,
+                sleep_last * _WAKING_CURVE[minutes] + sleep_wake_var,  # Waking up
+                0.0,  # Awake/daytime
+            ),
+        ),
+    )
+    sleep_arr = np.round(np.clip(sleep_arr, 0, 10), 1)
 
+    # --- MWI for the whole series in one vectorized pass ---
+    mwi_arr = calculate_mwi_vec(hr_arr, hrv_arr, stead_arr, sleep_hours)
 
-# --- End MWI Calculation ---
+    # Final values the parent writes back to state + Staff
+    final = {
+        "sleep_index_last_night": float(sleep_night[-1]),
+        "current_heart_rate": int(hr_arr[-1]),
+        "current_hrv": int(hrv_arr[-1]),
+        "current_steadiness": float(stead_arr[-1]),
+        "mental_wellness_index": float(mwi_arr[-1]),
+    }
+    return (hr_arr, hrv_arr, stead_arr, sleep_arr, mwi_arr), final
 
 
 # --- NEW Historical Data Population Function ---
@@ -104,367 +323,561 @@ def populate_historical_data(app, db):
     # Ensure simulation state is initialized for all staff
     # Use a separate state copy for historical simulation to avoid conflicts?
     # For simplicity, we'll use the main state but reset trends.
-    global staff_simulation_state, last_simulated_day
-    staff_simulation_state = {}  # Reset state for historical run
+    global sim_state, last_simulated_day
+    sim_state = SimState()  # Reset state for historical run
     last_simulated_day = None
     initialize_simulation_state(all_staff)  # Initialize based on current DB state
 
-    now = datetime.utcnow()
+    now = _utcnow()
     start_time = now - timedelta(days=2)
-    current_time = start_time
 
     simulation_interval_seconds = 5  # Simulate data point every 5 seconds
-    data_to_add = []
-
-    while current_time <= now:
-        current_day = current_time.day
-        current_hour_utc = current_time.hour
-        current_minute = current_time.minute
-
-        # Update daily values if the day has rolled over
-        if last_simulated_day != current_day:
-            for staff_id in staff_simulation_state:
-                # Simulate new sleep for the *previous* night when day changes
-                staff_simulation_state[staff_id]["sleep_index_last_night"] = (
-                    random.uniform(5.0, 9.5)
-                )
-            last_simulated_day = current_day
-            logger.debug(f"Historical sim: Updated daily values for day {current_day}")
-
-        for staff in all_staff:
-            state = staff_simulation_state[staff.id]
-            # Use staff's current values as starting point if needed, or simulate from scratch
-            # For simplicity, using state + staff model defaults as baseline
-            baseline_hr = state["baseline_hr"]
-            baseline_hrv = state["baseline_hrv"]
-            base_steadiness = state["base_steadiness"]
-            sleep_index_last_night = state["sleep_index_last_night"]
-            sleep_hours = state["sleep_hours"]  # Keep constant for now
-
-            # --- Simulate HR/HRV based on state trend (similar to live sim) ---
-            # We need current_hr/hrv to simulate next step, use state or defaults
-            prev_hr = staff.current_heart_rate  # Or state.get('last_hr', baseline_hr)
-            prev_hrv = staff.current_hrv  # Or state.get('last_hrv', baseline_hrv)
-
-            hr_change = random.randint(-2, 2) + state["hr_trend"] * 2
-            # Simplified trend logic for historical data (less likely to have extreme peaks)
-            if state["hr_trend"] == 0 and random.random() < (
-                state["stress_event_chance"] / 10
-            ):  # Lower chance
-                hr_change += random.randint(10, 20)
-                state["hr_trend"] = 1
-            elif state["hr_trend"] == 1:
-                state["hr_trend"] = -1
-            elif state["hr_trend"] == -1:
-                if prev_hr <= baseline_hr + 5:
-                    state["hr_trend"] = 0
-
-            current_hr = prev_hr + hr_change
-            if state["hr_trend"] == 0:
-                if current_hr > baseline_hr + 10:
-                    current_hr -= random.randint(0, 2)
-                elif current_hr < baseline_hr - 5:
-                    current_hr += random.randint(0, 1)
-            current_hr = max(50, min(160, current_hr))
-
-            hrv_change = random.randint(-3, 3)
-            if state["hr_trend"] == 1:
-                hrv_change -= random.randint(2, 5)
-            elif state["hr_trend"] == -1:
-                hrv_change += random.randint(1, 4)
-            if current_hr > 100:
-                hrv_change -= random.randint(0, 3)
-            elif current_hr < 70:
-                hrv_change += random.randint(0, 1)
-            current_hrv = max(15, min(100, prev_hrv + hrv_change))
-
-            # Update state for next iteration (optional, but helps continuity)
-            # state['last_hr'] = current_hr
-            # state['last_hrv'] = current_hrv
-
-            # --- Simulate Steadiness (similar to live sim) ---
-            prev_steadiness = (
-                staff.current_steadiness
-            )  # Or state.get('last_steadiness', base_steadiness)
-            steadiness_change = random.uniform(-0.05, 0.05)
-            if state["hr_trend"] == 1:
-                steadiness_change -= random.uniform(0.0, 0.1)
-            elif state["hr_trend"] == -1:
-                steadiness_change += random.uniform(0.0, 0.05)
-            current_steadiness = round(
-                max(0, min(1, base_steadiness + steadiness_change)), 2
-            )
-            # state['last_steadiness'] = current_steadiness
-
-            # --- Determine Sleep Index to store for this timestamp (Improved Logic) ---
-            current_sleep_index_to_store = 0.0  # Default to 0 (awake/daytime)
-
-            sleep_start_hour = 23
-            deep_sleep_start_hour = 0  # Midnight
-            wake_up_start_hour = 6
-            sleep_end_hour = 7  # Fully awake by 7:00
-
-            # Check if within the potential sleep window (22:00 - 07:59 UTC)
-            # This broad check avoids calculating sleep outside these hours
-            if not (
-                sleep_end_hour <= current_hour_utc < sleep_start_hour - 1
-            ):  # simplified check for outside 7am to 10pm
-
-                # Falling Asleep Phase (23:00 - 23:59)
-                if current_hour_utc == sleep_start_hour:
-                    progress = current_minute / 60.0
-                    target = sleep_index_last_night * progress
-                    variation = random.uniform(-0.5, 0.5)
-                    current_sleep_index_to_store = round(
-                        max(0, min(10, target + variation)), 1
-                    )
-
-                # Deep Sleep Phase (00:00 - 05:59)
-                elif deep_sleep_start_hour <= current_hour_utc < wake_up_start_hour:
-                    variation = random.uniform(
-                        -0.7, 0.7
-                    )  # Slightly more variation during sleep
-                    current_sleep_index_to_store = round(
-                        max(0, min(10, sleep_index_last_night + variation)), 1
-                    )
-
-                # Waking Up Phase (06:00 - 06:59)
-                elif current_hour_utc == wake_up_start_hour:
-                    progress = current_minute / 60.0
-                    target = sleep_index_last_night * (1 - progress)
-                    variation = random.uniform(-0.3, 0.3)
-                    current_sleep_index_to_store = round(
-                        max(0, min(10, target + variation)), 1
-                    )
-
-                # Else (e.g., 22:xx, 07:xx), it remains 0.0 as initialized
-
-            # --- Calculate MWI ---
-            mwi = calculate_mwi(
-                current_hr, current_hrv, current_steadiness, sleep_hours
+
+    # --- Timestamp grid, computed once for all staff ---
+    # One datetime64 vector instead of incrementing a datetime object
+    # ~34k times; hour/minute/day-of-run are derived as integer arrays.
+    ts64 = np.arange(
+        np.datetime64(start_time, "s"),
+        np.datetime64(now, "s") + np.timedelta64(1, "s"),
+        np.timedelta64(simulation_interval_seconds, "s"),
+    )
+    timestamps = ts64.tolist()  # Python datetimes for the DB rows
+    hours = ts64.astype("datetime64[h]").astype(np.int64) % 24
+    minutes = ts64.astype("datetime64[m]").astype(np.int64) % 60
+    # Index of each step's calendar day, for the nightly sleep-index redraw
+    day_idx = (
+        ts64.astype("datetime64[D]") - ts64[0].astype("datetime64[D]")
+    ).astype(np.int64)
+    n_days = int(day_idx[-1]) + 1
+
+    # --- Per-staff series, parallel across cores where possible ---
+    # Staff histories are independent, so each one is a self-contained job
+    # of primitives + shared arrays. One SeedSequence spawn hands every
+    # worker its own independent, reproducible random stream (rooted at
+    # SIM_SEED when set, so the whole backfill is replayable).
+    seeds = np.random.SeedSequence(_SIM_SEED).spawn(len(all_staff))
+    job_args = []
+    for staff, seed in zip(all_staff, seeds):
+        idx = sim_state.id_to_idx[staff.id]
+        job_args.append(
+            (
+                int(sim_state.baseline_hr[idx]),
+                int(sim_state.baseline_hrv[idx]),
+                float(sim_state.base_steadiness[idx]),
+                float(sim_state.sleep_hours[idx]),  # Keep constant for now
+                float(sim_state.sleep_index_last_night[idx]),
+                float(sim_state.stress_chance[idx]),
+                hours,
+                minutes,
+                day_idx,
+                n_days,
+                seed,
             )
+        )
 
-            # Create WearableData object
-            data_point = WearableData(
-                staff_id=staff.id,
-                timestamp=current_time,
-                heart_rate=current_hr,
-                hrv=current_hrv,
-                steadiness=current_steadiness,
-                sleep_index=current_sleep_index_to_store,
-                mwi=mwi,  # Store calculated MWI
+    results = None
+    if len(all_staff) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+                results = list(executor.map(_simulate_staff_history, *zip(*job_args)))
+        except Exception as e:
+            # e.g. no fork support, or eventlet interfering with the pool's
+            # machinery — the serial path below produces identical output
+            logger.warning(
+                "Parallel backfill unavailable (%s); simulating serially.", e
             )
-            data_to_add.append(data_point)
-
-            # --- Update Staff model (important for subsequent iterations) ---
-            # This ensures the *next* simulation step uses updated values
-            # We'll update the Staff object in memory but commit only at the end of history
-            # Note: This might be slow for very long histories; consider optimizing if needed
-            staff.current_heart_rate = current_hr
-            staff.current_hrv = current_hrv
-            staff.current_steadiness = current_steadiness
-            staff.mental_wellness_index = mwi
+            results = None
+    if results is None:
+        results = [_simulate_staff_history(*args) for args in job_args]
+
+    # Stream the rows into the DB as they are generated: the buffer is
+    # flushed through a Core executemany every chunk_size rows, so peak
+    # memory stays bounded by one chunk instead of the whole 48h window.
+    # One transaction overall; the backfill is a one-off rebuildable seed,
+    # so synchronous=OFF is safe to use for its duration.
+    chunk_size = 10_000
+    insert_stmt = WearableData.__table__.insert()
+    buffer = []
+    total_rows = 0
+    try:
+        db.session.execute(db.text("PRAGMA synchronous=OFF"))
+        for staff, (series, final) in zip(all_staff, results):
+            hr_arr, hrv_arr, stead_arr, sleep_arr, mwi_arr = series
+
+            # Plain dicts instead of ORM objects: these rows go straight
+            # into the INSERT. tolist() converts to Python scalars in one
+            # pass (sqlite3 rejects numpy scalar types).
+            staff_id = staff.id
+            for ts, hr_v, hrv_v, stead_v, sleep_v, mwi_v in zip(
+                timestamps,
+                hr_arr.tolist(),
+                hrv_arr.tolist(),
+                stead_arr.tolist(),
+                sleep_arr.tolist(),
+                mwi_arr.tolist(),
+            ):
+                buffer.append(
+                    {
+                        "staff_id": staff_id,
+                        "timestamp": ts,
+                        "heart_rate": hr_v,
+                        "hrv": hrv_v,
+                        "steadiness": stead_v,
+                        "sleep_index": sleep_v,
+                        "mwi": mwi_v,  # Store calculated MWI
+                        "steps": 0,
+                    }
+                )
+                if len(buffer) >= chunk_size:
+                    db.session.execute(insert_stmt, buffer)
+                    total_rows += len(buffer)
+                    buffer.clear()
+
+            # --- Update state + Staff model with final simulated values ---
+            idx = sim_state.id_to_idx[staff.id]
+            sim_state.hr_trend[idx] = 0  # History ends at baseline jitter
+            sim_state.sleep_index_last_night[idx] = final[
+                "sleep_index_last_night"
+            ]
+            staff.current_heart_rate = final["current_heart_rate"]
+            staff.current_hrv = final["current_hrv"]
+            staff.current_steadiness = final["current_steadiness"]
+            staff.mental_wellness_index = final["mental_wellness_index"]
             staff.current_sleep_index = round(
-                sleep_index_last_night, 1
+                final["sleep_index_last_night"], 1
             )  # Store actual last night score here
-            staff.last_update = current_time  # Track last simulated update time
+            staff.last_update = timestamps[-1]  # Last simulated update time
 
-        # Increment time for the next loop iteration
-        current_time += timedelta(seconds=simulation_interval_seconds)
-
-    # Bulk insert the generated data
-    if data_to_add:
-        logger.info(f"Bulk inserting {len(data_to_add)} historical records...")
-        db.session.bulk_save_objects(data_to_add)
+        if buffer:  # Flush the final partial chunk
+            db.session.execute(insert_stmt, buffer)
+            total_rows += len(buffer)
+            buffer.clear()
         db.session.commit()
-        logger.info("Bulk insert complete.")
-    else:
-        logger.warning("No historical data points were generated.")
+        if total_rows:
+            logger.info("Bulk insert complete (%s historical records).", total_rows)
+        else:
+            logger.warning("No historical data points were generated.")
+    except Exception as e:
+        logger.error("Error bulk inserting historical data: %s", e, exc_info=True)
+        db.session.rollback()
+    finally:
+        db.session.execute(db.text("PRAGMA synchronous=NORMAL"))
+
+    # Keep the day tracker in sync for the live simulation that follows
+    last_simulated_day = now.day
 
     # --- Final Update for Staff Model ---
-    # After populating history, commit the final state of the staff objects
+    # The staff instances came from Staff.query.all(), so the session is
+    # already tracking them; re-adding via add_all was a no-op that only
+    # forced extra identity-map bookkeeping. A plain commit persists any
+    # attribute writes that the bulk-insert commit did not already flush.
     if all_staff:
         logger.info("Committing final staff states after historical population...")
         try:
-            db.session.add_all(all_staff)  # Add potentially modified staff objects
             db.session.commit()
             logger.info("Final staff states committed.")
         except Exception as e:
-            logger.error(f"Error committing final staff states: {e}", exc_info=True)
+            logger.error("Error committing final staff states: %s", e, exc_info=True)
             db.session.rollback()
 
+    # The backfill rewrote every staff's vitals; drop any stale snapshots
+    invalidate_staff_cache()
+
 
 # --- End Historical Data Population ---
 
 
+# --- Per-tick numeric kernel ---
+# The branch-heavy trend state machine is factored out of simulate_data so
+# it can be numba-compiled. All randomness is drawn as blocks by the caller
+# and passed in, so the compiled and plain-numpy versions are
+# interchangeable (and identical given the same noise arrays).
+def _sim_step_loop(
+    prev_hr,
+    prev_hrv,
+    baseline_hr,
+    base_steadiness,
+    hr_trend,
+    stress_chance,
+    hr_noise,
+    event_roll,
+    spike,
+    pull_down,
+    pull_up,
+    hrv_noise,
+    hrv_stress,
+    hrv_recover,
+    hrv_high,
+    hrv_low,
+    stead_noise,
+    stead_stress,
+    stead_recover,
+):
+    n = prev_hr.shape[0]
+    current_hr = np.empty(n, np.int64)
+    current_hrv = np.empty(n, np.int64)
+    current_steadiness = np.empty(n, np.float64)
+    stress_code = np.empty(n, np.int64)
+    new_trend = hr_trend.copy()
+    new_chance = stress_chance.copy()
+    start_event = np.zeros(n, np.bool_)
+    was_peak = np.zeros(n, np.bool_)
+    recovered = np.zeros(n, np.bool_)
+
+    for i in range(n):
+        trend = hr_trend[i]
+        hr_change = hr_noise[i] + trend * 2
+
+        # Trend state transitions (stable -> peak -> recovery -> stable)
+        if trend == 0 and event_roll[i] < stress_chance[i]:
+            hr_change += spike[i]
+            start_event[i] = True
+            new_trend[i] = 1
+            new_chance[i] = 0.0
+        elif trend == 1:
+            was_peak[i] = True
+            new_trend[i] = -1
+        elif trend == -1 and prev_hr[i] <= baseline_hr[i] + 5:
+            recovered[i] = True
+            new_trend[i] = 0
+            new_chance[i] = 0.05
+
+        hr = prev_hr[i] + hr_change
+        # Gentle pull towards baseline while stable
+        if new_trend[i] == 0:
+            if hr > baseline_hr[i] + 10:
+                hr -= pull_down[i]
+            elif hr < baseline_hr[i] - 5:
+                hr += pull_up[i]
+        hr = max(50, min(160, hr))
+
+        # HRV moves inversely to stress/HR
+        hrv_change = hrv_noise[i]
+        if new_trend[i] == 1:
+            hrv_change -= hrv_stress[i]
+        elif new_trend[i] == -1:
+            hrv_change += hrv_recover[i]
+        if hr > 100:
+            hrv_change -= hrv_high[i]
+        elif hr < 70:
+            hrv_change += hrv_low[i]
+        hrv = max(15, min(100, prev_hrv[i] + hrv_change))
+
+        # Steadiness dips during stress, recovers afterwards
+        stead = base_steadiness[i] + stead_noise[i]
+        if new_trend[i] == 1:
+            stead -= stead_stress[i]
+        elif new_trend[i] == -1:
+            stead += stead_recover[i]
+
+        # Stress level as an int code (same thresholds as
+        # calculate_stress_level); the caller maps codes to strings once
+        if hr > 120 or hrv < 25:
+            stress_code[i] = 2  # Critical
+        elif hr > 100 or hrv < 40:
+            stress_code[i] = 1  # High
+        else:
+            stress_code[i] = 0  # Normal
+
+        current_hr[i] = hr
+        current_hrv[i] = hrv
+        current_steadiness[i] = max(0.0, min(1.0, stead))
+
+    return (
+        current_hr,
+        current_hrv,
+        current_steadiness,
+        stress_code,
+        new_trend,
+        new_chance,
+        start_event,
+        was_peak,
+        recovered,
+    )
+
+
+def _sim_step_numpy(
+    prev_hr,
+    prev_hrv,
+    baseline_hr,
+    base_steadiness,
+    hr_trend,
+    stress_chance,
+    hr_noise,
+    event_roll,
+    spike,
+    pull_down,
+    pull_up,
+    hrv_noise,
+    hrv_stress,
+    hrv_recover,
+    hrv_high,
+    hrv_low,
+    stead_noise,
+    stead_stress,
+    stead_recover,
+):
+    """Vectorized fallback with the same contract as _sim_step_loop."""
+    hr_change = hr_noise + hr_trend * 2
+
+    # Trend state transitions as boolean masks over the old trend
+    start_event = (hr_trend == 0) & (event_roll < stress_chance)
+    hr_change = hr_change + np.where(start_event, spike, 0)
+    was_peak = hr_trend == 1
+    recovered = (hr_trend == -1) & (prev_hr <= baseline_hr + 5)
+
+    new_trend = hr_trend.copy()
+    new_chance = stress_chance.copy()
+    new_trend[start_event] = 1
+    new_chance[start_event] = 0.0
+    new_trend[was_peak] = -1
+    new_trend[recovered] = 0
+    new_chance[recovered] = 0.05
+
+    current_hr = prev_hr + hr_change
+    # Gentle pull towards baseline while stable
+    stable = new_trend == 0
+    current_hr = current_hr - np.where(
+        stable & (current_hr > baseline_hr + 10), pull_down, 0
+    )
+    current_hr = current_hr + np.where(
+        stable & (current_hr < baseline_hr - 5), pull_up, 0
+    )
+    current_hr = np.clip(current_hr, 50, 160)
+
+    # HRV moves inversely to stress/HR
+    hrv_change = hrv_noise
+    hrv_change = hrv_change - np.where(new_trend == 1, hrv_stress, 0)
+    hrv_change = hrv_change + np.where(new_trend == -1, hrv_recover, 0)
+    hrv_change = hrv_change - np.where(current_hr > 100, hrv_high, 0)
+    hrv_change = hrv_change + np.where(current_hr < 70, hrv_low, 0)
+    current_hrv = np.clip(prev_hrv + hrv_change, 15, 100)
+
+    # Steadiness dips during stress, recovers afterwards
+    steadiness_change = stead_noise
+    steadiness_change = steadiness_change - np.where(new_trend == 1, stead_stress, 0.0)
+    steadiness_change = steadiness_change + np.where(
+        new_trend == -1, stead_recover, 0.0
+    )
+    current_steadiness = np.clip(base_steadiness + steadiness_change, 0, 1)
+
+    # Stress level as int codes in two np.where passes (same thresholds as
+    # calculate_stress_level); the caller maps codes to strings once
+    stress_code = np.where(
+        (current_hr > 120) | (current_hrv < 25),
+        2,
+        np.where((current_hr > 100) | (current_hrv < 40), 1, 0),
+    )
+
+    return (
+        current_hr,
+        current_hrv,
+        current_steadiness,
+        stress_code,
+        new_trend,
+        new_chance,
+        start_event,
+        was_peak,
+        recovered,
+    )
+
+
+# Compile the loop kernel to native code when numba is installed; the
+# numpy fallback keeps the app fully functional without it.
+try:
+    from numba import njit
+
+    _sim_step = njit(cache=True)(_sim_step_loop)
+except ImportError:
+    _sim_step = _sim_step_numpy
+
+
 # --- Simulation Logic for Live Updates ---
-def simulate_data(app, db, socketio, update_callback):
-    with app.app_context():  # Ensure we have app context
-        all_staff = Staff.query.all()
-        if not all_staff:
-            logger.warning("simulate_data: No staff found to simulate.")
-            return
-
-        now = datetime.utcnow()
-        simulated_data_points = []  # Collect points to potentially save
-        staff_to_update = []  # Collect staff objects that changed
-
-        for staff in all_staff:
-            state = staff_simulation_state[staff.id]
-            baseline_hr = state["baseline_hr"]
-            baseline_hrv = state["baseline_hrv"]
-            base_steadiness = state["base_steadiness"]
-
-            # Simulate HR fluctuations
-            # Base random change + effect of current trend (-1, 0, or 1) * multiplier
-            hr_change = random.randint(-2, 2) + state["hr_trend"] * 2
-
-            # --- Trend State Management ---
-            # Check if a new stress event should start (only if trend is stable)
-            if (
-                state["hr_trend"] == 0
-                and random.random() < state["stress_event_chance"]
-            ):
-                hr_change += random.randint(20, 40)  # Add large spike
-                state["hr_trend"] = 1  # Start increasing trend (stress peak)
-                state["stress_event_chance"] = (
-                    0  # Disable new events during stress/recovery
-                )
-                logger.info(f"Stress event triggered for Staff ID {staff.id}")
-            # Check if stress peak phase should end and recovery should begin
-            elif state["hr_trend"] == 1:
-                state["hr_trend"] = -1  # Start recovery trend (decreasing)
-                logger.info(f"Recovery phase started for Staff ID {staff.id}")
-            # Check if recovery phase should end
-            elif state["hr_trend"] == -1:
-                # Check if HR is back near baseline OR just end after one cycle
-                if staff.current_heart_rate <= baseline_hr + 5:
-                    state["hr_trend"] = 0  # Back to normal trend
-                    state["stress_event_chance"] = (
-                        0.05  # Re-enable chance for new stress events
-                    )
-                    logger.info(f"Recovery phase ended for Staff ID {staff.id}")
-                # else: keep hr_trend = -1 for another cycle if needed (optional refinement)
-
-            # --- HR Calculation ---
-            # Adjust HR based on calculated change
-            current_hr = staff.current_heart_rate + hr_change
-
-            # Add gentle pull towards baseline if significantly off AND trend is stable
-            if state["hr_trend"] == 0:
-                if current_hr > baseline_hr + 10:
-                    current_hr -= random.randint(0, 2)  # Stronger pull down
-                elif current_hr < baseline_hr - 5:
-                    current_hr += random.randint(0, 1)  # Gentle pull up
-
-            # Keep HR within reasonable bounds
-            current_hr = max(50, min(160, current_hr))
-
-            # --- HRV Calculation ---
-            # Simulate HRV (generally inverse to HR/stress)
-            hrv_change = random.randint(-3, 3)
-            # Stronger inverse effect based on trend:
-            if state["hr_trend"] == 1:  # Stressing -> Lower HRV more
-                hrv_change -= random.randint(4, 8)
-            elif state["hr_trend"] == -1:  # Recovering -> Increase HRV more
-                hrv_change += random.randint(2, 5)
-
-            # General inverse correlation with absolute HR level
-            if current_hr > 100:
-                hrv_change -= random.randint(1, 5)
-            elif current_hr < 70:
-                hrv_change += random.randint(0, 2)
-
-            # Keep HRV within reasonable bounds
-            current_hrv = max(15, min(100, staff.current_hrv + hrv_change))
-
-            # Simulate steps (simple random increment)
-            current_steps = random.randint(0, 10)
-
-            # Determine stress level
-            stress_level = calculate_stress_level(current_hr, current_hrv)
-
-            # --- Simulate Steadiness --- (Simple fluctuation around baseline)
-            steadiness_change = random.uniform(-0.05, 0.05)
-            # Reduce steadiness slightly during stress
-            if state["hr_trend"] == 1:
-                steadiness_change -= random.uniform(0.0, 0.1)
-            # Increase slightly during recovery
-            elif state["hr_trend"] == -1:
-                steadiness_change += random.uniform(0.0, 0.05)
-            current_steadiness = max(0, min(1, base_steadiness + steadiness_change))
-            # --- End Steadiness Simulation ---
-
-            # --- Get Sleep Index ---
-            # Get the value generated for last night
-            sleep_index_last_night = state["sleep_index_last_night"]
-            # Set current sleep index to 0 if it's considered 'daytime' (e.g., 8 AM - 10 PM UTC)
-            current_hour_utc = now.hour
-            is_night = 22 <= current_hour_utc or current_hour_utc < 8
-            # Get the stored sleep hours (or default)
-            sleep_hours = staff.sleep_hours_last_night or 7.5
-
-            # Determine sleep index to store in WearableData (0 during day)
-            # Use staff.current_sleep_index which should hold last night's score
-            sleep_index_to_store = 0.0
-            if is_night and staff.current_sleep_index is not None:
-                sleep_index_to_store = staff.current_sleep_index
-
-            # ... Calculate MWI (using sleep_hours) ...
-            current_mwi = calculate_mwi(
-                current_hr, current_hrv, current_steadiness, sleep_hours
+def simulate_data(app, db, batch_callback=None):
+    """Runs one simulation tick.
+
+    When batch_callback is given it is invoked once with the full list of
+    updated staff payloads after a successful commit (one broadcast per
+    tick, not one per staff). The list is also returned either way.
+    """
+    all_staff = _get_staff_rows()  # Snapshot dicts, cached across ticks
+    if not all_staff:
+        logger.warning("simulate_data: No staff found to simulate.")
+        return
+
+    now = _utcnow()  # Single clock read per tick; now.hour is hoisted below
+    n = len(all_staff)
+    simulated_data_points = []  # Collect points to potentially save
+    staff_updates = []  # Column mappings for the bulk Staff UPDATE
+    staff_to_update = []  # Serialized staff payloads for the broadcast
+
+    # --- Gather current values + per-staff state into arrays ---
+    # The SoA state gathers whole columns with one fancy-index each; only
+    # the ORM-held vitals still need a per-staff comprehension.
+    idx = np.array([sim_state.id_to_idx[staff["id"]] for staff in all_staff])
+    prev_hr = np.array([staff["current_heart_rate"] for staff in all_staff])
+    prev_hrv = np.array([staff["current_hrv"] for staff in all_staff])
+    baseline_hr = sim_state.baseline_hr[idx]
+    base_steadiness = sim_state.base_steadiness[idx]
+    hr_trend = sim_state.hr_trend[idx]
+    stress_chance = sim_state.stress_chance[idx]
+
+    # All per-tick randomness drawn as blocks up front; the branch-heavy
+    # trend/HR/HRV/steadiness arithmetic runs inside the _sim_step kernel
+    # (numba-compiled when available, plain numpy otherwise).
+    (
+        current_hr,
+        current_hrv,
+        current_steadiness,
+        stress_code,
+        new_trend,
+        new_chance,
+        start_event,
+        was_peak,
+        recovered,
+    ) = _sim_step(
+        prev_hr,
+        prev_hrv,
+        baseline_hr,
+        base_steadiness,
+        hr_trend,
+        stress_chance,
+        rng.integers(-2, 3, n),  # Base HR jitter
+        rng.random(n),  # Stress-event roll
+        rng.integers(20, 41, n),  # Stress spike size
+        rng.integers(0, 3, n),  # Pull towards baseline (down)
+        rng.integers(0, 2, n),  # Pull towards baseline (up)
+        rng.integers(-3, 4, n),  # Base HRV jitter
+        rng.integers(4, 9, n),  # HRV drop during stress
+        rng.integers(2, 6, n),  # HRV rebound during recovery
+        rng.integers(1, 6, n),  # HRV penalty while HR > 100
+        rng.integers(0, 3, n),  # HRV bonus while HR < 70
+        rng.uniform(-0.05, 0.05, n),  # Steadiness jitter
+        rng.uniform(0.0, 0.1, n),  # Steadiness drop during stress
+        rng.uniform(0.0, 0.05, n),  # Steadiness rebound during recovery
+    )
+
+    # Night window is the same for everyone this tick
+    current_hour_utc = now.hour
+    is_night = 22 <= current_hour_utc or current_hour_utc < 8
+
+    # One guard for all three event logs: when INFO is filtered out, the
+    # tick skips even the flatnonzero scans and loop setup
+    if logger.isEnabledFor(logging.INFO):
+        for event_idx in np.flatnonzero(start_event):
+            logger.info(
+                "Stress event triggered for Staff ID %s", all_staff[event_idx]["id"]
             )
-            # Clamp MWI just in case
-            current_mwi = max(0, min(100, round(current_mwi, 1)))
-
-            # Create new data record (WearableData)
-            data_point = WearableData(
-                staff_id=staff.id,
-                timestamp=now,
-                heart_rate=current_hr,
-                hrv=current_hrv,
-                steadiness=round(current_steadiness, 2),
-                # Store the potentially zeroed-out value for current timestamp
-                sleep_index=sleep_index_to_store,
-                mwi=current_mwi,  # Also store MWI in historical record
+        for peak_idx in np.flatnonzero(was_peak):
+            logger.info(
+                "Recovery phase started for Staff ID %s", all_staff[peak_idx]["id"]
             )
-            simulated_data_points.append(data_point)
-
-            # Update staff's current status
-            staff.current_heart_rate = current_hr
-            staff.current_hrv = current_hrv
-            staff.stress_level = stress_level
-            staff.current_steadiness = round(
-                current_steadiness, 2
-            )  # Store rounded value
-            staff.current_sleep_index = round(sleep_index_to_store, 1)
-            staff.sleep_hours_last_night = round(sleep_hours, 1)
-            staff.mental_wellness_index = current_mwi  # Update MWI on staff object
-            staff.last_update = now
-
-            # Commit changes for this staff member
-            staff_to_update.append(staff)
-
-            # Call the update callback (e.g., send_staff_update)
-            if update_callback:
-                update_callback(staff)
-
-        # --- Commit Changes ---
-        try:
-            # Add new wearable data points
-            if simulated_data_points:
-                db.session.add_all(simulated_data_points)
-
-            # Add staff objects marked for update (SQLAlchemy handles updates)
-            # No need to explicitly add if they were fetched from the session,
-            # but adding them ensures they are part of the commit.
-            # If staff objects were modified, they are already dirty.
-            # db.session.add_all(staff_to_update) # Usually not needed if staff came from session
-
-            db.session.commit()  # Commit both WearableData and Staff changes
-            logger.debug(
-                f"Committed {len(simulated_data_points)} data points and updates for {len(staff_to_update)} staff."
+        for rec_idx in np.flatnonzero(recovered):
+            logger.info(
+                "Recovery phase ended for Staff ID %s", all_staff[rec_idx]["id"]
             )
+
+    # --- Write results back to state + ORM objects ---
+    # Whole-column scatter instead of two dict writes per staff
+    sim_state.hr_trend[idx] = new_trend
+    sim_state.stress_chance[idx] = new_chance
+
+    for i, staff in enumerate(all_staff):
+        staff_id = staff["id"]  # Bound once; used for the point and update
+        hr = int(current_hr[i])
+        hrv = int(current_hrv[i])
+        steadiness = float(current_steadiness[i])
+
+        # Map the kernel's stress code to its display string
+        stress_level = _STRESS_LEVELS[stress_code[i]]
+
+        # Get the stored sleep hours (or default)
+        sleep_hours = staff["sleep_hours_last_night"] or 7.5
+
+        # Determine sleep index to store in WearableData (0 during day)
+        # current_sleep_index should hold last night's score
+        sleep_index_to_store = 0.0
+        if is_night and staff["current_sleep_index"] is not None:
+            sleep_index_to_store = staff["current_sleep_index"]
+
+        # Rounded values are written in two or three places each below, so
+        # round once here rather than per use
+        steadiness_rounded = round(steadiness, 2)
+        sleep_hours_rounded = round(sleep_hours, 1)
+        sleep_index_rounded = round(sleep_index_to_store, 1)
+
+        # ... Calculate MWI (using sleep_hours) ...
+        current_mwi = calculate_mwi(hr, hrv, steadiness, sleep_hours)
+        # Clamp MWI just in case
+        current_mwi = max(0, min(100, round(current_mwi, 1)))
+
+        # Create new data record (WearableData)
+        data_point = WearableData(
+            staff_id=staff_id,
+            timestamp=now,
+            heart_rate=hr,
+            hrv=hrv,
+            steadiness=steadiness_rounded,
+            # Store the potentially zeroed-out value for current timestamp
+            sleep_index=sleep_index_to_store,
+            mwi=current_mwi,  # Also store MWI in historical record
+        )
+        simulated_data_points.append(data_point)
+
+        # Staff's current status, as a plain mapping for one bulk UPDATE.
+        # Writing ORM attributes would mark every Staff instance dirty and
+        # push N separate UPDATEs through the unit of work at flush time.
+        staff_update = {
+            "id": staff_id,
+            "stress_level": stress_level,
+            "current_heart_rate": hr,
+            "current_hrv": hrv,
+            "current_steadiness": steadiness_rounded,
+            "current_sleep_index": sleep_index_rounded,
+            "sleep_hours_last_night": sleep_hours_rounded,
+            "mental_wellness_index": current_mwi,
+            "last_update": now,
+        }
+        staff_updates.append(staff_update)
+        # Full payload for the socket broadcast (same shape as to_dict()),
+        # merging the cached static fields with this tick's hot values
+        staff_to_update.append(sim_state.static_fields[idx[i]] | staff_update)
+        # Keep the snapshot current so the next tick starts from these
+        # values without re-reading the staff table
+        staff["current_heart_rate"] = hr
+        staff["current_hrv"] = hrv
+        staff["sleep_hours_last_night"] = sleep_hours_rounded
+        staff["current_sleep_index"] = sleep_index_rounded
+
+    # --- Commit Changes ---
+    # One commit for the whole tick: on SQLite each commit pays a full
+    # fsync, so batching N staff into one transaction is the cheap path.
+    try:
+        # Add new wearable data points
+        if simulated_data_points:
+            db.session.add_all(simulated_data_points)
+
+        # Single executemany UPDATE for all staff rows (SQLAlchemy 2.0
+        # "UPDATE by primary key" form; bulk_update_mappings is legacy)
+        if staff_updates:
+            db.session.execute(update(Staff), staff_updates)
+
+        db.session.commit()  # Commit both WearableData and Staff changes
+        logger.debug("Committed %s data points and updates for %s staff.", len(simulated_data_points), len(staff_updates)
+        )
+    except Exception as e:
+        logger.error("Error committing simulation data: %s", e, exc_info=True)
+        db.session.rollback()
+        # Snapshots advanced past what the DB holds; force a re-read
+        invalidate_staff_cache()
+        return []
+
+    # One callback for the whole batch; the caller decides what (if
+    # anything) actually goes out over the socket
+    if batch_callback is not None:
+        try:
+            batch_callback(staff_to_update)
         except Exception as e:
-            logger.error(f"Error committing simulation data: {e}", exc_info=True)
-            db.session.rollback()
+            logger.error("Error in simulation batch callback: %s", e, exc_info=True)
+
+    return staff_to_update
@@ -112,6 +112,14 @@ function App() {
       );
     });
 
+    newSocket.on('staff_batch_update', (updatedStaffList: StaffData[]) => {
+      // Backend sends one batched event per simulation tick
+      setStaffList((prevList) => {
+        const updatesById = new Map(updatedStaffList.map((s) => [s.id, s]));
+        return prevList.map((staff) => updatesById.get(staff.id) ?? staff);
+      });
+    });
+
     newSocket.on('connect_error', (err: Error) => {
       console.error('Socket connection error:', err);
     });